@@ -1,15 +1,32 @@
 #!/usr/bin/env python3
 
-import whisper
-import textdistance
+from pronunciation_core import get_model, score_references, transcribe, transcribe_batch, word_details
+import asyncio
+import os
+import re
+from itertools import compress
 import gradio as gr
-import plotly.graph_objects as go
-import json
-import numpy as np
-import warnings
+import orjson
 from datetime import datetime
 
-warnings.filterwarnings("ignore", message="FP16 is not supported on CPU")
+FRENCH_SIBILANTS = {
+    's': {'weight': 1.0, 'type': 'voiceless_alveolar'},
+    'z': {'weight': 1.1, 'type': 'voiced_alveolar'},
+    'ch': {'weight': 1.2, 'type': 'voiceless_postalveolar'},
+    'j': {'weight': 1.3, 'type': 'voiced_postalveolar'}
+}
+
+# Single pass over a word instead of one substring scan per sibilant
+SIBILANT_RE = re.compile('|'.join(sorted(FRENCH_SIBILANTS, key=len, reverse=True)))
+LATERAL_RE = re.compile('sl|tl')
+
+JSON_OPTIONS = orjson.OPT_INDENT_2
+
+# Number of clips encoded and decoded together in one batched pass
+BATCH_SIZE = 8
+
+# Requests handled concurrently; pronunciation_core limits the Whisper calls themselves
+CONCURRENCY_LIMIT = 4
 
 class FrenchPronunciationEvaluator:
     def __init__(self):
@@ -20,106 +37,104 @@ class FrenchPronunciationEvaluator:
             'jaro': 80.0,
             'lisp_severity': 3.0
         }
-        
-    def enhanced_lisp_detection(self, all_words, ref_words):
+
+    def enhanced_lisp_detection(self, transcription, ref_words):
         """Enhanced lisp detection with severity scoring"""
-        french_sibilants = {
-            's': {'weight': 1.0, 'type': 'voiceless_alveolar'},
-            'z': {'weight': 1.1, 'type': 'voiced_alveolar'},
-            'ch': {'weight': 1.2, 'type': 'voiceless_postalveolar'},
-            'j': {'weight': 1.3, 'type': 'voiced_postalveolar'}
-        }
-        
         lisp_candidates = []
+        trans_sibilants = []
         total_severity = 0.0
         
-        for w in all_words:
-            word_lower = w['word'].lower()
-            confidence = w.get('probability', 1.0)
+        for word, word_lower, start, end, confidence in zip(transcription.words, transcription.lower,
+                                                            transcription.starts.tolist(), transcription.ends.tolist(),
+                                                            transcription.probs.tolist()):
+            if not SIBILANT_RE.search(word_lower):
+                continue
+            trans_sibilants.append(word_lower)
+            
+            # Word-level indicators are shared by every sibilant, only the weight differs
+            base_severity = 0.0
+            
+            # Low confidence indicates potential mispronunciation
+            if confidence < 0.7:
+                base_severity += (0.7 - confidence) * 5.0
+            
+            # Check for interdental lisp indicators
+            if 'th' in word_lower:
+                base_severity += 2.0
+            
+            # Check for lateral lisp patterns
+            if LATERAL_RE.search(word_lower):
+                base_severity += 1.5
+            
+            if base_severity == 0.0:
+                continue
             
             # Check for sibilant sounds
-            for sibilant, config in french_sibilants.items():
+            for sibilant, config in FRENCH_SIBILANTS.items():
                 if sibilant in word_lower:
-                    severity = 0.0
-                    
-                    # Low confidence indicates potential mispronunciation
-                    if confidence < 0.7:
-                        severity += (0.7 - confidence) * 5.0 * config['weight']
-                    
-                    # Check for interdental lisp indicators
-                    if 'th' in word_lower:
-                        severity += 2.0 * config['weight']
-                    
-                    # Check for lateral lisp patterns
-                    if any(pattern in word_lower for pattern in ['sl', 'tl']):
-                        severity += 1.5 * config['weight']
-                    
+                    severity = base_severity * config['weight']
                     if severity > 0.5:
                         capped_severity = min(5.0, severity)
                         lisp_candidates.append({
-                            "word": w['word'],
-                            "start": w['start'],
-                            "end": w['end'],
+                            "word": word,
+                            "start": start,
+                            "end": end,
                             "confidence": confidence,
                             "severity": capped_severity,
                             "sibilant_type": config['type']
                         })
                         total_severity += capped_severity
         
-        ref_sibilants = [w for w in ref_words if any(s in w.lower() for s in french_sibilants.keys())]
-        trans_sibilants = [w['word'].lower() for w in all_words if any(s in w['word'].lower() for s in french_sibilants.keys())]
-        missing_sibilants = [w for w in ref_sibilants if w not in trans_sibilants]
+        ref_sibilants = [w for w in ref_words if SIBILANT_RE.search(w)]
+        trans_sibilant_set = set(trans_sibilants)
+        missing_sibilants = [w for w in ref_sibilants if w not in trans_sibilant_set]
         
         return lisp_candidates, missing_sibilants, min(5.0, total_severity)
 
     def evaluate_pronunciation(self, audio_file_path, reference_text):
         """Enhanced evaluation with production thresholds"""
-        model = whisper.load_model("base")
-        result = model.transcribe(
-            audio_file_path, 
-            language='fr',
-            temperature=0.0,
-            word_timestamps=True
+        return self.evaluate_transcription(transcribe(audio_file_path), reference_text)
+
+    def evaluate_transcription(self, transcription, reference_text):
+        """Score an existing transcription against the reference text"""
+        # Score against every accepted variant and keep the closest one
+        reference_texts = [reference_text] if isinstance(reference_text, str) else list(reference_text)
+        reference_scores = score_references(transcription.text, reference_texts)
+        best = max(range(len(reference_texts)), key=lambda i: reference_scores[i]['global_score'])
+        reference_text = reference_texts[best]
+        global_score, levenshtein_score, jaccard_score, jaro_score = (
+            reference_scores[best][k] for k in ['global_score', 'levenshtein', 'jaccard', 'jaro']
         )
         
-        transcribed_text = result["text"].strip()
-        segments = result.get('segments', [])
-        all_words = [w for seg in segments for w in seg.get('words', [])]
-        ref_words = reference_text.lower().strip().split()
-        trans_words = [w['word'].lower() for w in all_words]
-        
-        # Calculate similarity scores
-        ref_clean = reference_text.lower().strip()
-        trans_clean = transcribed_text.lower().strip()
-        
-        levenshtein_score = round((1 - textdistance.levenshtein.normalized_distance(ref_clean, trans_clean)) * 100, 1)
-        jaccard_score = round(textdistance.jaccard.similarity(ref_clean.split(), trans_clean.split()) * 100, 1)
-        jaro_score = round(textdistance.jaro_winkler.similarity(ref_clean, trans_clean) * 100, 1)
-        global_score = round(levenshtein_score * 0.5 + jaccard_score * 0.3 + jaro_score * 0.2, 1)
+        ref_words = reference_text.casefold().strip().split()
+        trans_words = transcription.lower
 
         # Enhanced lisp detection
-        lisp_candidates, missing_sibilants, lisp_severity = self.enhanced_lisp_detection(all_words, ref_words)
+        lisp_candidates, missing_sibilants, lisp_severity = self.enhanced_lisp_detection(transcription, ref_words)
         
         # Word analysis
-        missing_words = [w for w in ref_words if w not in trans_words]
-        added_words = [w for w in trans_words if w not in ref_words]
-        low_conf_words = [w['word'] for w in all_words if w.get('probability', 1.0) < 0.6]
+        ref_set = set(ref_words)
+        trans_set = set(trans_words)
+        missing_words = [w for w in ref_words if w not in trans_set]
+        added_words = [w for w in trans_words if w not in ref_set]
+        low_conf_words = list(compress(transcription.words, transcription.probs < 0.6))
         
         # Production readiness assessment
         production_ready = self.assess_production_readiness(global_score, levenshtein_score, jaccard_score, jaro_score, lisp_severity)
 
         return {
             "success": True,
+            "reference": reference_text,
+            "reference_scores": [dict(scores, reference=ref) for ref, scores in zip(reference_texts, reference_scores)],
             "global_score": global_score,
             "levenshtein": levenshtein_score,
             "jaccard": jaccard_score,
             "jaro": jaro_score,
-            "transcribed": transcribed_text,
+            "transcribed": transcription.text,
             "missing_words": missing_words,
             "added_words": added_words,
             "low_confidence_words": low_conf_words,
-            "word_details": all_words,
-            "language": result.get("language", "unknown"),
+            "language": transcription.language or "unknown",
             "lisp_candidates": lisp_candidates,
             "missing_sibilants": missing_sibilants,
             "lisp_severity": lisp_severity,
@@ -156,6 +171,9 @@ class FrenchPronunciationEvaluator:
 
     def create_radar_chart(self, scores):
         """Create radar chart visualization"""
+        # Imported on first use to keep plotly out of interpreter startup
+        import plotly.graph_objects as go
+        
         metrics = ['Global Score', 'Levenshtein', 'Jaccard', 'Jaro-Winkler']
         values = [scores['global_score'], scores['levenshtein'], scores['jaccard'], scores['jaro']]
         thresholds = [self.thresholds['global_score'], self.thresholds['levenshtein'], 
@@ -190,23 +208,31 @@ class FrenchPronunciationEvaluator:
         
         return fig
 
-def process_audio_enhanced(audio_file, reference_text):
+async def process_audio_enhanced(audio_file, reference_text, variants_text="", use_reference_prompt=False, progress=gr.Progress()):
     """Enhanced processing with visualization and detailed analysis"""
     if not audio_file or not reference_text.strip():
         return "❌ Please provide both audio file and reference text.", None, ""
     
     try:
         # Show processing status
-        processing_msg = "🔄 Processing audio with Whisper... Please wait."
+        progress(0, desc="🔄 Processing audio with Whisper... Please wait.")
+        
+        # The reference is scored as a whole; each non-empty variant line is an accepted alternative
+        variants = [line.strip() for line in (variants_text or "").splitlines() if line.strip()]
+        reference_texts = [reference_text.strip()] + variants
         
         evaluator = FrenchPronunciationEvaluator()
-        result = evaluator.evaluate_pronunciation(audio_file, reference_text)
+        # Prompting with one variant would bias the best-variant choice toward it
+        initial_prompt = reference_texts[0] if use_reference_prompt and not variants else None
+        transcription = await asyncio.to_thread(transcribe, audio_file, initial_prompt)
+        progress(0.8, desc="📊 Scoring pronunciation...")
+        result = await asyncio.to_thread(evaluator.evaluate_transcription, transcription, reference_texts)
         
         if result["success"]:
             # Create summary report
             summary = f"""# 🎯 French Pronunciation Analysis
 
-**📝 Reference**: {reference_text}
+**📝 Reference**: {result['reference']}{f" (best of {len(reference_texts)} variants)" if len(reference_texts) > 1 else ""}
 **🎙️ Transcribed**: {result['transcribed']}
 **🌍 Language**: {result['language']}
 **📅 Evaluated**: {result['timestamp'][:19]}
@@ -226,52 +252,37 @@ def process_audio_enhanced(audio_file, reference_text):
 **Low Confidence**: {', '.join(result['low_confidence_words']) if result['low_confidence_words'] else 'None'}"""
 
             # Lisp analysis with proper severity display
+            sections = [summary]
             if result['lisp_candidates']:
                 capped_severity = min(5.0, result['lisp_severity'])
-                summary += f"\n\n## ⚠️ Sibilant Analysis (Severity: {capped_severity:.1f}/5.0)\n"
-                for lisp in result['lisp_candidates']:
-                    summary += f"• **{lisp['word']}** ({lisp['sibilant_type']}) - Severity: {lisp['severity']:.1f}, Confidence: {lisp['confidence']:.2f}\n"
+                sections.append(f"\n\n## ⚠️ Sibilant Analysis (Severity: {capped_severity:.1f}/5.0)\n")
+                sections.extend(
+                    f"• **{lisp['word']}** ({lisp['sibilant_type']}) - Severity: {lisp['severity']:.1f}, Confidence: {lisp['confidence']:.2f}\n"
+                    for lisp in result['lisp_candidates']
+                )
                 if result['missing_sibilants']:
-                    summary += f"\n**Missing sibilants**: {', '.join(result['missing_sibilants'])}"
+                    sections.append(f"\n**Missing sibilants**: {', '.join(result['missing_sibilants'])}")
             else:
-                summary += "\n\n## ✅ Sibilant Analysis\nNo pronunciation issues detected in French sibilant sounds."
+                sections.append("\n\n## ✅ Sibilant Analysis\nNo pronunciation issues detected in French sibilant sounds.")
+            summary = "".join(sections)
 
             # Create radar chart
             radar_chart = evaluator.create_radar_chart(result)
             
-            # Detailed JSON - convert all non-serializable types
-            def convert_to_serializable(obj):
-                if isinstance(obj, (np.integer, np.int64, np.int32)):
-                    return int(obj)
-                elif isinstance(obj, (np.floating, np.float64, np.float32)):
-                    return float(obj)
-                elif isinstance(obj, (np.bool_, bool)):
-                    return bool(obj)
-                elif isinstance(obj, np.ndarray):
-                    return obj.tolist()
-                elif hasattr(obj, 'item'):  # Handle other numpy scalars
-                    return obj.item()
-                elif isinstance(obj, dict):
-                    return {k: convert_to_serializable(v) for k, v in obj.items()}
-                elif isinstance(obj, (list, tuple)):
-                    return [convert_to_serializable(item) for item in obj]
-                elif obj is None or isinstance(obj, (str, int, float)):
-                    return obj
-                else:
-                    return str(obj)  # Fallback for any other type
-            
+            # Detailed JSON - per-word dicts are only built for this report
             json_data = {
                 "scores": {k: v for k, v in result.items() if k in ['global_score', 'levenshtein', 'jaccard', 'jaro']},
+                "reference_scores": result['reference_scores'],
                 "production_assessment": result['production_ready'],
                 "lisp_analysis": {
                     "severity": result['lisp_severity'],
                     "candidates": result['lisp_candidates'],
                     "missing_sibilants": result['missing_sibilants']
                 },
-                "word_details": result['word_details']
+                "word_details": word_details(transcription)
             }
             
-            detailed_json = json.dumps(convert_to_serializable(json_data), indent=2)
+            detailed_json = orjson.dumps(json_data, default=str, option=JSON_OPTIONS).decode()
             
             return summary, radar_chart, detailed_json
         else:
@@ -280,6 +291,54 @@ def process_audio_enhanced(audio_file, reference_text):
     except Exception as e:
         return f"❌ Processing error: {str(e)}", None, ""
 
+async def process_batch_enhanced(audio_files, references_text, use_reference_prompt=False, progress=gr.Progress()):
+    """Batch processing of several clips, one reference line per audio file"""
+    references = [line.strip() for line in (references_text or "").splitlines() if line.strip()]
+    if not audio_files or not references:
+        return "❌ Please provide audio files and one reference text per file.", ""
+    if len(references) != len(audio_files):
+        return f"❌ Got {len(audio_files)} audio files but {len(references)} reference lines.", ""
+    
+    try:
+        evaluator = FrenchPronunciationEvaluator()
+        rows = [
+            "| File | Reference | Transcribed | Global Score | Lisp Severity | Status |",
+            "|------|-----------|-------------|--------------|---------------|--------|"
+        ]
+        reports = []
+        
+        if use_reference_prompt:
+            # Each clip needs its own prompt, and BatchedInferencePipeline would prepend it to every chunk
+            transcriptions = []
+            for audio_file, reference_text in progress.tqdm(list(zip(audio_files, references)), desc="🔄 Transcribing clips"):
+                transcriptions.append(await asyncio.to_thread(transcribe, audio_file, reference_text))
+        else:
+            progress(0, desc=f"🔄 Transcribing {len(audio_files)} clips in batches of {BATCH_SIZE}...")
+            transcriptions = await asyncio.to_thread(transcribe_batch, audio_files, BATCH_SIZE)
+        
+        progress(0.8, desc="📊 Scoring pronunciation...")
+        for audio_file, reference_text, transcription in zip(audio_files, references, transcriptions):
+            result = await asyncio.to_thread(evaluator.evaluate_transcription, transcription, reference_text)
+            file_name = os.path.basename(audio_file)
+            rows.append(
+                f"| {file_name} | {reference_text} | {result['transcribed']} | {result['global_score']}/100 "
+                f"| {result['lisp_severity']:.1f}/5.0 | {result['production_ready']['status']} |"
+            )
+            reports.append({
+                "file": file_name,
+                "reference": reference_text,
+                "transcribed": result['transcribed'],
+                "scores": {k: v for k, v in result.items() if k in ['global_score', 'levenshtein', 'jaccard', 'jaro']},
+                "production_assessment": result['production_ready'],
+                "lisp_severity": result['lisp_severity']
+            })
+        
+        summary = "# 📦 Batch Pronunciation Analysis\n\n" + "\n".join(rows)
+        return summary, orjson.dumps(reports, default=str, option=JSON_OPTIONS).decode()
+        
+    except Exception as e:
+        return f"❌ Processing error: {str(e)}", ""
+
 def create_enhanced_interface():
     with gr.Blocks(title="Enhanced French Pronunciation Evaluator", theme=gr.themes.Soft()) as interface:
         gr.Markdown("""
@@ -302,6 +361,17 @@ def create_enhanced_interface():
                     lines=2,
                     max_lines=4
                 )
+                variants_input = gr.Textbox(
+                    label="✅ Accepted Variants (optional)",
+                    info="One alternative reference per line; the closest of the reference and its variants is scored",
+                    lines=2,
+                    max_lines=6
+                )
+                prompt_input = gr.Checkbox(
+                    label="🎯 Guide Whisper with the reference text",
+                    info="Faster and steadier on short clips, but not a blind evaluation. Ignored when accepted variants are given",
+                    value=False
+                )
                 evaluate_btn = gr.Button(
                     "🚀 Evaluate Pronunciation", 
                     variant="primary", 
@@ -319,9 +389,45 @@ def create_enhanced_interface():
         
         evaluate_btn.click(
             process_audio_enhanced,
-            inputs=[audio_input, text_input],
+            inputs=[audio_input, text_input, variants_input, prompt_input],
             outputs=[summary_output, radar_plot, json_output],
-            show_progress=True
+            show_progress=True,
+            concurrency_limit=CONCURRENCY_LIMIT
+        )
+        
+        with gr.Accordion("📦 Batch Evaluation", open=False):
+            gr.Markdown("Evaluate several clips in one run. Enter one reference line per audio file, in upload order.")
+            with gr.Row():
+                with gr.Column(scale=1):
+                    batch_audio_input = gr.File(
+                        label="🎵 Upload French Audio Files",
+                        file_count="multiple",
+                        file_types=["audio"],
+                        type="filepath"
+                    )
+                    batch_text_input = gr.Textbox(
+                        label="📝 Reference Texts (one per line)",
+                        lines=4
+                    )
+                    batch_prompt_input = gr.Checkbox(
+                        label="🎯 Guide Whisper with each reference text",
+                        value=False
+                    )
+                    batch_evaluate_btn = gr.Button(
+                        "🚀 Evaluate Batch",
+                        variant="primary"
+                    )
+                
+                with gr.Column(scale=2):
+                    batch_summary_output = gr.Markdown("*Upload audio files and click evaluate...*")
+                    batch_json_output = gr.Code(label="Batch JSON Report", language="json", lines=10)
+        
+        batch_evaluate_btn.click(
+            process_batch_enhanced,
+            inputs=[batch_audio_input, batch_text_input, batch_prompt_input],
+            outputs=[batch_summary_output, batch_json_output],
+            show_progress=True,
+            concurrency_limit=CONCURRENCY_LIMIT
         )
         
         with gr.Accordion("📊 Metrics Explanation & Scoring", open=False):
@@ -418,10 +524,11 @@ def create_enhanced_interface():
             
             ## 🔧 Technical Notes
             
-            - **Model**: OpenAI Whisper Base (optimized for French)
+            - **Model**: Whisper Base via faster-whisper (CTranslate2; FP16 on GPU, INT8 on CPU)
             - **Confidence Threshold**: 60% for low-confidence word detection
             - **Language Detection**: Automatic with French preference
             - **Word Timestamps**: Precise timing for detailed analysis
+            - **Reference Prompting**: Optional; biases decoding toward the reference text, so leave it off for blind evaluation. Skipped when accepted variants are given, so the best-variant choice is not biased toward one of them
             """)
         
         with gr.Accordion("📋 Production Thresholds", open=False):
@@ -442,5 +549,7 @@ def create_enhanced_interface():
     return interface
 
 if __name__ == "__main__":
+    # Warm up the model so the first evaluation is not cold
+    get_model()
     interface = create_enhanced_interface()
     interface.launch()
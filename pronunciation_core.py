@@ -0,0 +1,229 @@
+"""Shared Whisper transcription and similarity scoring for the French pronunciation evaluators"""
+
+from faster_whisper import BatchedInferencePipeline, WhisperModel, decode_audio
+from faster_whisper.vad import get_speech_timestamps
+import ctranslate2
+from rapidfuzz import process
+from rapidfuzz.distance import JaroWinkler, Levenshtein
+import hashlib
+import threading
+import os
+import numpy as np
+from collections import OrderedDict, namedtuple
+
+# Whisper expects mono float32 audio at 16 kHz
+SAMPLE_RATE = 16000
+
+# Whisper encodes audio in 30-second windows
+WINDOW_SAMPLES = 30 * SAMPLE_RATE
+
+# Decoding options shared by the single-clip and batched paths
+WHISPER_OPTIONS = dict(
+    language='fr',
+    temperature=0.0,
+    beam_size=1,
+    word_timestamps=True
+)
+
+# Recent transcriptions kept so re-scoring the same recording skips Whisper
+TRANSCRIPTION_CACHE_SIZE = 32
+
+# Run on every visible GPU when CUDA is available, one model call in flight per device
+CUDA_DEVICE_COUNT = ctranslate2.get_cuda_device_count()
+DEVICE = "cuda" if CUDA_DEVICE_COUNT else "cpu"
+MODEL_WORKERS = max(1, CUDA_DEVICE_COUNT)
+
+# FP16 where the GPU supports it, otherwise let CTranslate2 pick the fastest supported type
+GPU_COMPUTE_TYPE = (
+    "float16" if CUDA_DEVICE_COUNT and "float16" in ctranslate2.get_supported_compute_types("cuda")
+    else "auto"
+)
+
+# Word-level results kept as parallel arrays rather than one dict per word
+Transcription = namedtuple('Transcription', ['text', 'words', 'lower', 'starts', 'ends', 'probs', 'language'])
+
+_model = None
+_model_lock = threading.Lock()
+# Shared by every interface in the process: at most one Whisper call in flight per device
+_model_slots = threading.BoundedSemaphore(MODEL_WORKERS)
+_transcriptions = OrderedDict()
+_transcriptions_lock = threading.Lock()
+
+def get_model():
+    """Load the Whisper model once and keep it resident between requests"""
+    global _model
+    with _model_lock:
+        if _model is None and DEVICE == "cuda":
+            _model = WhisperModel(
+                "base",
+                device="cuda",
+                device_index=list(range(CUDA_DEVICE_COUNT)),
+                compute_type=GPU_COMPUTE_TYPE,
+                # Replicas per device: the device_index list already gives one per GPU
+                num_workers=1
+            )
+        elif _model is None:
+            # CTranslate2 INT8 kernels are several times faster than FP32 on CPU
+            _model = WhisperModel(
+                "base",
+                device="cpu",
+                compute_type="int8",
+                cpu_threads=os.cpu_count() or 0
+            )
+    return _model
+
+def _decode(audio_file_path):
+    """Decode audio in-process; the samples serve as both cache key and model input"""
+    audio = decode_audio(audio_file_path, sampling_rate=SAMPLE_RATE)
+    return audio, hashlib.blake2b(audio.tobytes()).hexdigest()
+
+def transcribe(audio_file_path, initial_prompt=None):
+    """Transcribe French audio into a Transcription of text, word arrays and detected language"""
+    audio, digest = _decode(audio_file_path)
+    key = (digest, False, initial_prompt)
+
+    # Cache hits never wait for a model slot
+    transcription = _cached_transcription(key)
+    if transcription is None:
+        with _model_slots:
+            transcription = _run_whisper(audio, initial_prompt)
+        _store_transcription(key, transcription)
+    return transcription
+
+def transcribe_batch(audio_file_paths, batch_size):
+    """Transcribe several clips, sharing encoder passes between clips that fit one window"""
+    decoded = [_decode(path) for path in audio_file_paths]
+    keys = [(digest, True, None) for _, digest in decoded]
+    transcriptions = [_cached_transcription(key) for key in keys]
+
+    pending = [i for i, transcription in enumerate(transcriptions) if transcription is None]
+    short = [i for i in pending if len(decoded[i][0]) <= WINDOW_SAMPLES]
+    long = [i for i in pending if len(decoded[i][0]) > WINDOW_SAMPLES]
+
+    if pending:
+        with _model_slots:
+            if short:
+                batched = _run_whisper_batch([decoded[i][0] for i in short], batch_size)
+                for i, transcription in zip(short, batched):
+                    transcriptions[i] = transcription
+            # Clips longer than one window cannot share a batch slot
+            for i in long:
+                transcriptions[i] = _run_whisper(decoded[i][0])
+        for i in pending:
+            _store_transcription(keys[i], transcriptions[i])
+    return transcriptions
+
+def _cached_transcription(key):
+    """Return a cached transcription and mark it as recently used, or None"""
+    with _transcriptions_lock:
+        if key in _transcriptions:
+            _transcriptions.move_to_end(key)
+            return _transcriptions[key]
+    return None
+
+def _store_transcription(key, transcription):
+    """Add a transcription to the LRU cache, evicting the oldest entry when full"""
+    with _transcriptions_lock:
+        _transcriptions[key] = transcription
+        if len(_transcriptions) > TRANSCRIPTION_CACHE_SIZE:
+            _transcriptions.popitem(last=False)
+
+def _run_whisper(audio, initial_prompt=None):
+    """Run the Whisper model on decoded audio samples without caching"""
+    options = dict(WHISPER_OPTIONS, vad_filter=True)
+    if initial_prompt:
+        # Bias decoding toward the expected words. WhisperModel.transcribe feeds the prompt to the
+        # first window only; the batched pipeline would prepend it to every chunk, so prompted
+        # clips never go through _run_whisper_batch
+        options.update(initial_prompt=initial_prompt, condition_on_previous_text=False)
+    segments, info = get_model().transcribe(audio, **options)
+    return _to_transcription(list(segments), info.language)
+
+def _run_whisper_batch(audios, batch_size):
+    """One batched pipeline run over several clips of at most one window each"""
+    # Concatenate the clips and hand the speech regions of each (in samples) to the pipeline
+    # as chunks. Running the same VAD as the single-clip path keeps silence, where Whisper
+    # hallucinates, out of the decoder and gives a silent clip an empty transcription
+    offsets = np.cumsum([0] + [len(audio) for audio in audios])
+    clip_timestamps = [
+        {'start': int(start) + region['start'], 'end': int(start) + region['end']}
+        for audio, start in zip(audios, offsets[:-1])
+        for region in get_speech_timestamps(audio, sampling_rate=SAMPLE_RATE)
+    ]
+    if not clip_timestamps:
+        return [_to_transcription([], WHISPER_OPTIONS['language']) for _ in audios]
+
+    # A pipeline per run: it keeps word-timestamp state between chunks, so concurrent
+    # batches on a multi-GPU host must not share one
+    segments, info = BatchedInferencePipeline(model=get_model()).transcribe(
+        np.concatenate(audios),
+        batch_size=batch_size,
+        clip_timestamps=clip_timestamps,
+        **dict(WHISPER_OPTIONS, vad_filter=False)
+    )
+
+    # Every segment comes from exactly one chunk and every chunk from one clip; assign it by its midpoint
+    boundaries = offsets[1:-1] / SAMPLE_RATE
+    clip_segments = [[] for _ in audios]
+    for seg in segments:
+        clip_segments[int(np.searchsorted(boundaries, (seg.start + seg.end) / 2, side='right'))].append(seg)
+    return [
+        _to_transcription(segs, info.language, offset=start / SAMPLE_RATE)
+        for segs, start in zip(clip_segments, offsets[:-1])
+    ]
+
+def _to_transcription(segments, language, offset=0.0):
+    """Flatten segments into a Transcription, shifting word times by the clip offset"""
+    all_words = [w for seg in segments for w in (seg.words or [])]
+    return Transcription(
+        text="".join(seg.text for seg in segments).strip(),
+        words=[w.word for w in all_words],
+        lower=[w.word.casefold() for w in all_words],
+        starts=np.fromiter((w.start - offset for w in all_words), dtype=np.float64, count=len(all_words)),
+        ends=np.fromiter((w.end - offset for w in all_words), dtype=np.float64, count=len(all_words)),
+        probs=np.fromiter((w.probability for w in all_words), dtype=np.float64, count=len(all_words)),
+        language=language
+    )
+
+def word_details(transcription):
+    """Per-word dicts for reports, built from the transcription arrays"""
+    return [
+        {'word': word, 'start': start, 'end': end, 'probability': prob}
+        for word, start, end, prob in zip(transcription.words, transcription.starts.tolist(),
+                                          transcription.ends.tolist(), transcription.probs.tolist())
+    ]
+
+def score_references(transcribed_text, reference_texts):
+    """Similarity scores of one transcription against every candidate reference"""
+    trans_clean = transcribed_text.casefold().strip()
+    refs_clean = [ref.casefold().strip() for ref in reference_texts]
+
+    if len(refs_clean) == 1:
+        # rapidfuzz runs Hyyrö's bit-parallel Levenshtein and a bitmask Jaro-Winkler:
+        # prompts up to 64 characters fit a single uint64, so each call is O(len(text)).
+        # Calling them directly skips cdist's matrix allocation and thread pool
+        levenshtein_row = [Levenshtein.normalized_similarity(trans_clean, refs_clean[0])]
+        jaro_row = [JaroWinkler.similarity(trans_clean, refs_clean[0])]
+    else:
+        # Pairwise similarity rows computed in C across all references at once
+        levenshtein_row = process.cdist([trans_clean], refs_clean, scorer=Levenshtein.normalized_similarity,
+                                        dtype=np.float64, workers=-1)[0]
+        jaro_row = process.cdist([trans_clean], refs_clean, scorer=JaroWinkler.similarity,
+                                 dtype=np.float64, workers=-1)[0]
+    trans_set = set(trans_clean.split())
+
+    scores = []
+    for ref_clean, levenshtein_sim, jaro_sim in zip(refs_clean, levenshtein_row, jaro_row):
+        levenshtein_score = round(float(levenshtein_sim) * 100, 1)
+        # Jaccard: intersection over union of the word sets
+        ref_set = set(ref_clean.split())
+        jaccard = len(ref_set & trans_set) / max(1, len(ref_set | trans_set))
+        jaccard_score = round(jaccard * 100, 1)
+        jaro_score = round(float(jaro_sim) * 100, 1)
+        scores.append({
+            "global_score": round(levenshtein_score * 0.5 + jaccard_score * 0.3 + jaro_score * 0.2, 1),
+            "levenshtein": levenshtein_score,
+            "jaccard": jaccard_score,
+            "jaro": jaro_score
+        })
+    return scores